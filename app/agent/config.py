@@ -38,6 +38,16 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 EMAIL_ENABLED = os.getenv("EMAIL_ENABLED", "false").lower() == "true"
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 
+# Deadlines (seconds) for the /approve_plan agent task graph. Worker threads cannot be
+# cancelled, so the LLM and SendGrid clients carry their own timeouts: a call abandoned at
+# its deadline still ends shortly after (LLM: at most AGENT_LLM_TIMEOUT * (retries + 1)).
+AGENT_ANALYSIS_TIMEOUT = float(os.getenv("AGENT_ANALYSIS_TIMEOUT", "60"))
+AGENT_ACTION_TIMEOUT = float(os.getenv("AGENT_ACTION_TIMEOUT", "60"))
+AGENT_LLM_TIMEOUT = float(os.getenv("AGENT_LLM_TIMEOUT", "30"))
+AGENT_LLM_MAX_RETRIES = int(os.getenv("AGENT_LLM_MAX_RETRIES", "1"))
+AGENT_MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "8"))
+SENDGRID_TIMEOUT = float(os.getenv("SENDGRID_TIMEOUT", "20"))
+
 if not GEMINI_API_KEY:
     raise ValueError("❌ GEMINI_API_KEY not found in .env file")
 
@@ -45,7 +55,9 @@ if not GEMINI_API_KEY:
 llm = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash",
     google_api_key=GEMINI_API_KEY,
-    temperature=0
+    temperature=0,
+    timeout=AGENT_LLM_TIMEOUT,
+    max_retries=AGENT_LLM_MAX_RETRIES
 )
 
 # LLM Prompt for agent analysis
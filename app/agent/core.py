@@ -1,27 +1,49 @@
+import asyncio
+import contextvars
+import functools
 import logging
-from typing import Dict, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional, Tuple
 
-from app.agent.config import llm, AGENT_ANALYSIS_PROMPT, logger
+from app.agent.config import llm, AGENT_ANALYSIS_PROMPT, AGENT_ANALYSIS_TIMEOUT, AGENT_ACTION_TIMEOUT, \
+    AGENT_MAX_WORKERS, logger
 from app.agent.tools import save_medicine_to_excel, send_email_schedule
 from app.agent.parser import parse_medicines_from_text
 
-def process_medicines(plan_section: str) -> Dict[str, Any]:
+def analyze_plan(plan_section: str) -> str:
+    """Run the agent analysis prompt once; the result is shared by all plan actions."""
+    analysis_prompt = AGENT_ANALYSIS_PROMPT.format(plan_section=plan_section)
+    response = llm.invoke(analysis_prompt)
+    return response.content
+
+
+def extract_medicines_text(analysis: str) -> str:
+    if "MEDICINES_FOUND:" not in analysis:
+        return ""
+    medicines_section = analysis.split("MEDICINES_FOUND:")[1]
+    return medicines_section.split("APPOINTMENT_FOUND:")[0].strip() \
+        if "APPOINTMENT_FOUND:" in medicines_section else medicines_section.strip()
+
+
+def extract_appointment_text(analysis: str) -> str:
+    if "APPOINTMENT_FOUND:" not in analysis:
+        return ""
+    return analysis.split("APPOINTMENT_FOUND:")[1].strip()
+
+
+def process_medicines(plan_section: str, analysis: Optional[str] = None) -> Dict[str, Any]:
     logger.info("💊 Processing Medicines...")
     try:
-        analysis_prompt = AGENT_ANALYSIS_PROMPT.format(plan_section=plan_section)
-        response = llm.invoke(analysis_prompt)
-        analysis = response.content
+        if analysis is None:
+            analysis = analyze_plan(plan_section)
 
-        if "MEDICINES_FOUND:" in analysis:
-            medicines_section = analysis.split("MEDICINES_FOUND:")[1]
-            medicines_text = medicines_section.split("APPOINTMENT_FOUND:")[0].strip() \
-                if "APPOINTMENT_FOUND:" in medicines_section else medicines_section.strip()
-
-            if medicines_text.lower() != "none" and medicines_text.strip():
-                logger.info(f"Processing medicines: {medicines_text}")
-                medicines_data = parse_medicines_from_text(medicines_text)
-                excel_result = save_medicine_to_excel(medicines_data)
-                return {"status": "success", "result": excel_result}
+        medicines_text = extract_medicines_text(analysis)
+        if medicines_text.lower() != "none" and medicines_text.strip():
+            logger.info(f"Processing medicines: {medicines_text}")
+            medicines_data = parse_medicines_from_text(medicines_text)
+            excel_result = save_medicine_to_excel(medicines_data)
+            return {"status": "success", "result": excel_result}
 
         return {"status": "success", "result": "No medicines found."}
 
@@ -30,7 +52,8 @@ def process_medicines(plan_section: str) -> Dict[str, Any]:
         return {"status": "error", "error": str(e)}
 
 
-def process_appointment(plan_section: str, user_email: str, send_email: bool = True) -> Dict[str, Any]:
+def process_appointment(plan_section: str, user_email: str, send_email: bool = True,
+                        analysis: Optional[str] = None) -> Dict[str, Any]:
     """
     Process appointment scheduling from the plan section.
     
@@ -38,41 +61,39 @@ def process_appointment(plan_section: str, user_email: str, send_email: bool = T
         plan_section: The plan section from SOAP summary
         user_email: Email address to send appointment to
         send_email: If False, only generates email content without sending
+        analysis: Precomputed output of analyze_plan; computed here if not given
     
     Returns:
         dict with status, email_content (if send_email=False), result, and error (if any)
     """
     logger.info("📅 Processing Appointment...")
     try:
-        analysis_prompt = AGENT_ANALYSIS_PROMPT.format(plan_section=plan_section)
-        response = llm.invoke(analysis_prompt)
-        analysis = response.content
-
-        if "APPOINTMENT_FOUND:" in analysis:
-            appointment_text = analysis.split("APPOINTMENT_FOUND:")[1].strip()
-
-            if appointment_text.lower() != "none" and appointment_text.strip():
-                logger.info(f"Processing appointment: {appointment_text}")
-                
-                # Generate email content
-                email_content = generate_appointment_email_content(appointment_text, plan_section)
-                
-                if not send_email:
-                    # Return email content for preview without sending
-                    logger.info("Email content generated for preview (not sent)")
-                    return {
-                        "status": "success",
-                        "email_content": email_content,
-                        "message": "Email content generated for preview"
-                    }
-                
-                # Actually send the email
-                email_result = send_email_schedule(appointment_text, user_email)
+        if analysis is None:
+            analysis = analyze_plan(plan_section)
+
+        appointment_text = extract_appointment_text(analysis)
+        if appointment_text.lower() != "none" and appointment_text.strip():
+            logger.info(f"Processing appointment: {appointment_text}")
+            
+            # Generate email content
+            email_content = generate_appointment_email_content(appointment_text, plan_section)
+            
+            if not send_email:
+                # Return email content for preview without sending
+                logger.info("Email content generated for preview (not sent)")
                 return {
                     "status": "success",
-                    "result": email_result,
-                    "message": "Appointment email sent successfully"
+                    "email_content": email_content,
+                    "message": "Email content generated for preview"
                 }
+            
+            # Actually send the email
+            email_result = send_email_schedule(appointment_text, user_email)
+            return {
+                "status": "success",
+                "result": email_result,
+                "message": "Appointment email sent successfully"
+            }
 
         return {
             "status": "success",
@@ -85,6 +106,158 @@ def process_appointment(plan_section: str, user_email: str, send_email: bool = T
         return {"status": "error", "error": str(e)}
 
 
+# --- Plan action task graph ---
+# Each action is a blocking function `(context, deps) -> result dict` (or None to skip),
+# where `context` holds plan_section, user_email, send_email and the shared analysis,
+# and `deps` maps each dependency name to its result. Actions run on a dedicated thread
+# pool; independent actions run concurrently.
+#
+# Deadlines: a worker thread cannot be cancelled, so an action "timed out" by asyncio may
+# still finish. Actions without side effects are abandoned at their deadline and reported
+# as "timeout". Side-effecting actions (writing files, sending email) always run to
+# completion, bounded by their clients' own timeouts, so the reported result is final and
+# a client retrying on failure never repeats an action that actually succeeded.
+
+ACTION_REGISTRY: Dict[str, Dict[str, Any]] = {}
+
+_ACTION_EXECUTOR = ThreadPoolExecutor(max_workers=AGENT_MAX_WORKERS, thread_name_prefix="agent-action")
+
+
+def register_action(name: str, depends_on: Tuple[str, ...] = (), timeout: Optional[float] = None,
+                    side_effects: bool = False,
+                    when: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Callable:
+    """
+    Decorator registering a plan action. Dependencies must already be registered.
+
+    Args:
+        timeout: Deadline in seconds (default AGENT_ACTION_TIMEOUT); ignored for side-effecting actions
+        side_effects: The action changes external state and must never be reported before it finishes
+        when: Predicate on the context; if it returns False the action (and its dependents) is skipped
+    """
+    def decorator(func: Callable[[Dict[str, Any], Dict[str, Any]], Optional[Dict[str, Any]]]) -> Callable:
+        if name in ACTION_REGISTRY:
+            raise ValueError(f"Agent action '{name}' is already registered")
+        missing = [dep for dep in depends_on if dep not in ACTION_REGISTRY]
+        if missing:
+            raise ValueError(f"Agent action '{name}' depends on unregistered actions: {missing}")
+        ACTION_REGISTRY[name] = {
+            "func": func,
+            "depends_on": tuple(depends_on),
+            "timeout": timeout,
+            "side_effects": side_effects,
+            "when": when,
+        }
+        return func
+    return decorator
+
+
+@register_action("medicine_processing", side_effects=True)
+def medicine_processing_action(context: Dict[str, Any], deps: Dict[str, Any]) -> Dict[str, Any]:
+    return process_medicines(context["plan_section"], analysis=context["analysis"])
+
+
+@register_action("appointment_preview")
+def appointment_preview_action(context: Dict[str, Any], deps: Dict[str, Any]) -> Dict[str, Any]:
+    return process_appointment(context["plan_section"], context["user_email"],
+                               send_email=False, analysis=context["analysis"])
+
+
+@register_action("appointment_sending", depends_on=("appointment_preview",), side_effects=True,
+                 when=lambda context: context["send_email"])
+def appointment_sending_action(context: Dict[str, Any], deps: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    preview = deps["appointment_preview"]
+    if not preview or preview.get("status") != "success" or "email_content" not in preview:
+        return None
+    return process_appointment(context["plan_section"], context["user_email"],
+                               send_email=True, analysis=context["analysis"])
+
+
+def _resolve_actions(names: Optional[List[str]], context: Dict[str, Any]) -> List[str]:
+    """
+    Requested actions plus their dependencies, in registration (topological) order,
+    minus actions whose `when` predicate rejects the context and anything depending on them.
+    """
+    if names is None:
+        required = set(ACTION_REGISTRY)
+    else:
+        unknown = [name for name in names if name not in ACTION_REGISTRY]
+        if unknown:
+            raise ValueError(f"Unknown agent actions: {unknown}")
+        required = set()
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name not in required:
+                required.add(name)
+                pending.extend(ACTION_REGISTRY[name]["depends_on"])
+
+    resolved: List[str] = []
+    for name, action in ACTION_REGISTRY.items():
+        if name not in required:
+            continue
+        if action["when"] is not None and not action["when"](context):
+            continue
+        if all(dep in resolved for dep in action["depends_on"]):
+            resolved.append(name)
+    return resolved
+
+
+def _submit(func: Callable, *args: Any) -> "asyncio.Future":
+    """Run func on the agent thread pool, keeping the caller's context (session ID for logging)."""
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(_ACTION_EXECUTOR, functools.partial(contextvars.copy_context().run, func, *args))
+
+
+async def run_plan_actions(plan_section: str, user_email: str, send_email: bool = True,
+                           actions: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Analyze the plan once, then run the registered actions as a task graph.
+
+    Returns a dict mapping action name to its result. Actions that raise are reported with
+    status "error", and actions without side effects that miss their deadline with status
+    "timeout", without affecting the others; skipped actions are omitted.
+    """
+    context = {"plan_section": plan_section, "user_email": user_email, "send_email": send_email}
+    names = _resolve_actions(actions, context)
+
+    try:
+        context["analysis"] = await asyncio.wait_for(_submit(analyze_plan, plan_section), AGENT_ANALYSIS_TIMEOUT)
+    except asyncio.TimeoutError:
+        error = f"Plan analysis timed out after {AGENT_ANALYSIS_TIMEOUT:g}s"
+        logger.error(error)
+        return {name: {"status": "timeout", "error": error} for name in names}
+    except Exception as e:
+        logger.error(f"Plan analysis failed: {e}")
+        return {name: {"status": "error", "error": str(e)} for name in names}
+
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_action(name: str) -> Optional[Dict[str, Any]]:
+        action = ACTION_REGISTRY[name]
+        deps = {dep: await tasks[dep] for dep in action["depends_on"]}
+        timeout = action["timeout"] or AGENT_ACTION_TIMEOUT
+        started = time.perf_counter()
+        try:
+            if action["side_effects"]:
+                result = await _submit(action["func"], context, deps)
+            else:
+                result = await asyncio.wait_for(_submit(action["func"], context, deps), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Agent action '{name}' timed out after {timeout:g}s")
+            return {"status": "timeout", "error": f"Action timed out after {timeout:g}s"}
+        except Exception as e:
+            logger.error(f"Agent action '{name}' failed: {e}")
+            return {"status": "error", "error": str(e)}
+        logger.info(f"Agent action '{name}' finished in {time.perf_counter() - started:.2f}s")
+        return result
+
+    # All tasks are created before any of them runs, so dependencies can be awaited by name
+    for name in names:
+        tasks[name] = asyncio.create_task(run_action(name))
+    outcomes = await asyncio.gather(*tasks.values())
+    return {name: result for name, result in zip(tasks, outcomes) if result is not None}
+
+
 def generate_appointment_email_content(appointment_text: str, plan_section: str) -> str:
     """
     Generate email content for appointment scheduling.
@@ -10,7 +10,7 @@ from typing import List, Dict, Any
 import os
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
-from app.agent.config import EMAIL_ENABLED, SENDGRID_API_KEY, logger
+from app.agent.config import EMAIL_ENABLED, SENDGRID_API_KEY, SENDGRID_TIMEOUT, logger
 
 def sanitize_excel_data(value) -> Any:
     """Sanitize data to prevent Excel formula interpretation"""
@@ -64,6 +64,7 @@ def send_email_schedule(details: str, user_email: str) -> str:
     )
     try:
         sg = SendGridAPIClient(SENDGRID_API_KEY)
+        sg.client.timeout = SENDGRID_TIMEOUT  # propagates to the request builders used by send()
         response = sg.send(message)
         print(f"[DEBUG] SendGrid response status: {response.status_code}")
         print(f"[DEBUG] SendGrid response body: {response.body}")
@@ -3,7 +3,9 @@ import os
 import logging
 from faster_whisper import WhisperModel
 from pydub import AudioSegment
+from typing import Optional
 from app.agent.config import logger 
+from app.pipeline.segments import TranscriptSegments
 
 def load_whisper_model(model_name: str = "medium.en", device: str = "cpu") -> WhisperModel:
     """Load faster-whisper model"""
@@ -17,15 +19,13 @@ def load_whisper_model(model_name: str = "medium.en", device: str = "cpu") -> Wh
         logger.error(f"Failed to load Whisper model: {e}")
         raise
 
-def ensure_wav(audio_path: str) -> str:
-    """Convert MP3/M4A/FLAC to WAV if needed"""
+def ensure_wav(audio_path: str, output_dir: Optional[str] = None) -> str:
+    """Convert MP3/M4A/FLAC to WAV if needed, writing into output_dir (default: next to the input)"""
     if audio_path.lower().endswith((".mp3", ".m4a", ".flac")):
-        temp_dir = os.path.dirname(audio_path)
+        temp_dir = output_dir or os.path.dirname(audio_path)
         wav_path = os.path.join(temp_dir, f"{os.path.splitext(os.path.basename(audio_path))[0]}.wav")
 
-        if os.path.exists(wav_path):
-            return wav_path
-
+        # Always convert: an existing WAV with the same name may be stale from an earlier upload
         try:
             if audio_path.lower().endswith(".mp3"):
                 AudioSegment.from_mp3(audio_path).export(wav_path, format="wav")
@@ -41,21 +41,20 @@ def ensure_wav(audio_path: str) -> str:
             return audio_path
     return audio_path
 
-def transcribe_file(whisper_model: WhisperModel, audio_path: str, beam_size: int = 5) -> str:
-    """Transcribe audio file with Whisper"""
+def transcribe_segments(whisper_model: WhisperModel, audio_path: str, beam_size: int = 5,
+                        word_timestamps: bool = False) -> Optional[TranscriptSegments]:
+    """Transcribe audio file with Whisper, keeping segment timings and probabilities"""
     if not whisper_model:
         logger.error("Whisper model not loaded. Cannot transcribe.")
-        return ""
+        return None
     try:
-        segments, _ = whisper_model.transcribe(audio_path, word_timestamps=False, beam_size=beam_size)
-        text_parts = []
-        for seg in segments:
-            if hasattr(seg, "text"):
-                text_parts.append(seg.text.strip())
-            else:
-                text_parts.append(str(seg).strip())
-        text = " ".join([p for p in text_parts if p])
-        return " ".join(text.split())
+        segments, _ = whisper_model.transcribe(audio_path, word_timestamps=word_timestamps, beam_size=beam_size)
+        return TranscriptSegments.from_segments(segments)
     except Exception as e:
         logger.error(f"Transcription failed for {audio_path}: {e}")
-        return ""
\ No newline at end of file
+        return None
+
+def transcribe_file(whisper_model: WhisperModel, audio_path: str, beam_size: int = 5) -> str:
+    """Transcribe audio file with Whisper"""
+    segments = transcribe_segments(whisper_model, audio_path, beam_size, word_timestamps=False)
+    return segments.text if segments is not None else ""
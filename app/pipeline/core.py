@@ -3,7 +3,8 @@ import logging
 from typing import List, Tuple, Dict, Set, Optional
 from faster_whisper import WhisperModel # Import only for type hinting
 import spacy # Import only for type hinting
-from app.pipeline.audio_utils import load_whisper_model, ensure_wav, transcribe_file
+from app.pipeline.audio_utils import load_whisper_model, ensure_wav, transcribe_file, transcribe_segments
+from app.pipeline.segments import TranscriptSegments
 
 from app.pipeline.gemini_llm import query_gemini_summary
 from app.pipeline.nlp_utils import load_ner_model, extract_entities, calculate_ner_metrics
@@ -20,12 +21,15 @@ class MedicalAudioProcessor:
         self.whisper_model = load_whisper_model(whisper_model_name, device)
         self.nlp = load_ner_model()
 
-    def ensure_wav(self, audio_path: str) -> str:
-        return ensure_wav(audio_path)
+    def ensure_wav(self, audio_path: str, output_dir: Optional[str] = None) -> str:
+        return ensure_wav(audio_path, output_dir)
 
     def transcribe_file(self, audio_path: str, beam_size: int = 5) -> str:
         return transcribe_file(self.whisper_model, audio_path, beam_size)
 
+    def transcribe_segments(self, audio_path: str, beam_size: int = 5, word_timestamps: bool = False) -> Optional[TranscriptSegments]:
+        return transcribe_segments(self.whisper_model, audio_path, beam_size, word_timestamps)
+
     def query_gemini(self, transcript: str) -> str:
         return query_gemini_summary(transcript)
 
@@ -0,0 +1,237 @@
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import msgpack
+
+from app.agent.config import logger
+
+SEGMENTS_FORMAT_VERSION = 1
+
+# Columns are stored as float32 / uint32 arrays; the binary format is always little-endian.
+_FLOAT_COLUMNS = ("start", "end", "avg_logprob", "no_speech_prob")
+_WORD_FLOAT_COLUMNS = ("word_start", "word_end", "word_prob")
+
+
+def _to_le_bytes(values: array) -> bytes:
+    if sys.byteorder == "little":
+        return values.tobytes()
+    swapped = array(values.typecode, values)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _from_le_bytes(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+class TranscriptSegments:
+    """
+    Column-oriented store for Whisper segments and (optionally) word timestamps.
+
+    The transcript text is kept once as a single string; each segment is an entry in
+    array-backed start/end/probability columns plus an offset into that string, so a
+    long transcript costs a few bytes per segment instead of a dict per segment.
+    """
+
+    def __init__(self) -> None:
+        self.start = array("f")
+        self.end = array("f")
+        self.avg_logprob = array("f")
+        self.no_speech_prob = array("f")
+        # text_offsets[i] is where segment i starts in `text`; one extra trailing entry
+        # marks the end (segments are separated by a single space).
+        self.text_offsets = array("I", [0])
+        # word_offsets[i]:word_offsets[i + 1] is the range of words belonging to segment i
+        self.word_offsets = array("I", [0])
+        self.word_start = array("f")
+        self.word_end = array("f")
+        self.word_prob = array("f")
+        self.word_text_offsets = array("I", [0])
+        self._parts: List[str] = []
+        self._word_parts: List[str] = []
+        self._text: Optional[str] = None
+        self._word_text: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    @property
+    def has_words(self) -> bool:
+        return len(self.word_start) > 0
+
+    @property
+    def text(self) -> str:
+        """Full transcript, equivalent to the string previously returned by transcribe_file."""
+        if self._text is None:
+            self._text = " ".join(self._parts)
+            self._parts = []
+        return self._text
+
+    @property
+    def word_text(self) -> str:
+        if self._word_text is None:
+            self._word_text = "".join(self._word_parts)
+            self._word_parts = []
+        return self._word_text
+
+    def append(self, seg: Any) -> None:
+        """Append a faster-whisper segment; segments with no text are dropped."""
+        text = _normalize(seg.text if hasattr(seg, "text") else str(seg))
+        if not text:
+            return
+        if self._text is not None or self._word_text is not None:
+            raise RuntimeError("Cannot append to a finalized TranscriptSegments")
+
+        self.start.append(float(getattr(seg, "start", 0.0) or 0.0))
+        self.end.append(float(getattr(seg, "end", 0.0) or 0.0))
+        self.avg_logprob.append(float(getattr(seg, "avg_logprob", 0.0) or 0.0))
+        self.no_speech_prob.append(float(getattr(seg, "no_speech_prob", 0.0) or 0.0))
+        self._parts.append(text)
+        self.text_offsets.append(self.text_offsets[-1] + len(text) + 1)
+
+        for word in getattr(seg, "words", None) or ():
+            word_text = word.word.strip()
+            if not word_text:
+                continue
+            self.word_start.append(float(word.start))
+            self.word_end.append(float(word.end))
+            self.word_prob.append(float(word.probability))
+            self._word_parts.append(word_text)
+            self.word_text_offsets.append(self.word_text_offsets[-1] + len(word_text))
+        self.word_offsets.append(len(self.word_start))
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Any]) -> "TranscriptSegments":
+        store = cls()
+        for seg in segments:
+            store.append(seg)
+        return store
+
+    def segment_text(self, index: int) -> str:
+        return self.text[self.text_offsets[index]:self.text_offsets[index + 1] - 1]
+
+    def segment_at_offset(self, char_offset: int) -> int:
+        """Index of the segment containing a character offset into `text` (for highlighting)."""
+        if not len(self):
+            raise IndexError("No segments")
+        return max(0, min(len(self) - 1, bisect_right(self.text_offsets, char_offset) - 1))
+
+    def index_range(self, start_time: Optional[float] = None, end_time: Optional[float] = None) -> Tuple[int, int]:
+        """Half-open [lo, hi) segment index range overlapping the time window [start_time, end_time]."""
+        lo = 0 if start_time is None else bisect_right(self.end, start_time)
+        hi = len(self) if end_time is None else bisect_left(self.start, end_time)
+        return lo, max(lo, hi)
+
+    def words(self, index: int) -> List[Dict[str, Any]]:
+        word_text = self.word_text
+        out = []
+        for w in range(self.word_offsets[index], self.word_offsets[index + 1]):
+            out.append({
+                "start": round(self.word_start[w], 3),
+                "end": round(self.word_end[w], 3),
+                "probability": round(self.word_prob[w], 4),
+                "word": word_text[self.word_text_offsets[w]:self.word_text_offsets[w + 1]],
+            })
+        return out
+
+    def to_dict(self, lo: int = 0, hi: Optional[int] = None, include_words: bool = False) -> Dict[str, Any]:
+        """Row-oriented JSON view of segments [lo, hi)."""
+        hi = len(self) if hi is None else hi
+        rows = []
+        for i in range(lo, hi):
+            row = {
+                "index": i,
+                "start": round(self.start[i], 3),
+                "end": round(self.end[i], 3),
+                "avg_logprob": round(self.avg_logprob[i], 4),
+                "no_speech_prob": round(self.no_speech_prob[i], 4),
+                "text": self.segment_text(i),
+                "char_offset": self.text_offsets[i],
+            }
+            if include_words:
+                row["words"] = self.words(i)
+            rows.append(row)
+        return {"total": len(self), "offset": lo, "segments": rows}
+
+    def to_msgpack(self, lo: int = 0, hi: Optional[int] = None, include_words: bool = False) -> bytes:
+        """Columnar binary view of segments [lo, hi): raw little-endian arrays plus the text slice."""
+        hi = len(self) if hi is None else hi
+        text_lo = self.text_offsets[lo]
+        text_hi = max(text_lo, self.text_offsets[hi] - 1)
+        payload: Dict[str, Any] = {
+            "v": SEGMENTS_FORMAT_VERSION,
+            "total": len(self),
+            "offset": lo,
+            "text": self.text[text_lo:text_hi],
+            "text_offsets": _to_le_bytes(array("I", (o - text_lo for o in self.text_offsets[lo:hi + 1]))),
+        }
+        for name in _FLOAT_COLUMNS:
+            payload[name] = _to_le_bytes(getattr(self, name)[lo:hi])
+
+        if include_words:
+            w_lo, w_hi = self.word_offsets[lo], self.word_offsets[hi]
+            wt_lo = self.word_text_offsets[w_lo]
+            payload["word_offsets"] = _to_le_bytes(array("I", (o - w_lo for o in self.word_offsets[lo:hi + 1])))
+            payload["word_text"] = self.word_text[wt_lo:self.word_text_offsets[w_hi]]
+            payload["word_text_offsets"] = _to_le_bytes(
+                array("I", (o - wt_lo for o in self.word_text_offsets[w_lo:w_hi + 1]))
+            )
+            for name in _WORD_FLOAT_COLUMNS:
+                payload[name] = _to_le_bytes(getattr(self, name)[w_lo:w_hi])
+        return msgpack.packb(payload, use_bin_type=True)
+
+    @classmethod
+    def from_msgpack(cls, data: bytes) -> "TranscriptSegments":
+        payload = msgpack.unpackb(data, raw=False)
+        if payload.get("v") != SEGMENTS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported segments format version: {payload.get('v')}")
+        store = cls()
+        for name in _FLOAT_COLUMNS:
+            setattr(store, name, _from_le_bytes("f", payload[name]))
+        store.text_offsets = _from_le_bytes("I", payload["text_offsets"])
+        store._text = payload["text"]
+        if "word_offsets" in payload:
+            store.word_offsets = _from_le_bytes("I", payload["word_offsets"])
+            store.word_text_offsets = _from_le_bytes("I", payload["word_text_offsets"])
+            store._word_text = payload["word_text"]
+            for name in _WORD_FLOAT_COLUMNS:
+                setattr(store, name, _from_le_bytes("f", payload[name]))
+        else:
+            store.word_offsets = array("I", [0] * (len(store) + 1))
+        return store
+
+
+class SegmentStore:
+    """Bounded in-memory LRU of TranscriptSegments keyed by a server-generated ID."""
+
+    def __init__(self, max_sessions: int = 256) -> None:
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, TranscriptSegments]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: str, segments: TranscriptSegments) -> None:
+        with self._lock:
+            self._sessions[key] = segments
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                logger.info(f"Segment store full ({self.max_sessions}); evicted least recently used transcript")
+
+    def get(self, key: str) -> Optional[TranscriptSegments]:
+        with self._lock:
+            segments = self._sessions.get(key)
+            if segments is not None:
+                self._sessions.move_to_end(key)
+            return segments
@@ -0,0 +1,193 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.agent.config import logger
+
+MEMORY_SCRATCH_ROOT = "/dev/shm"
+
+
+def _entry_size(entry: os.DirEntry) -> int:
+    """Size in bytes of a file, or of everything below a directory."""
+    try:
+        if not entry.is_dir(follow_symlinks=False):
+            return entry.stat(follow_symlinks=False).st_size
+        total = 0
+        for dirpath, _, filenames in os.walk(entry.path):
+            for name in filenames:
+                try:
+                    total += os.lstat(os.path.join(dirpath, name)).st_size
+                except OSError:
+                    pass
+        return total
+    except OSError:
+        return 0
+
+
+def _remove_entry(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class StorageManager:
+    """
+    Owns the on-disk artifacts of the backend: per-request scratch directories for
+    uploads and converted WAVs, plus any other directories swept by a background
+    janitor. Each managed directory has its own age limit and optional size quota.
+    """
+
+    def __init__(self, base_dir: str, max_bytes: Optional[int] = 2 * 1024 ** 3,
+                 scratch_max_age_seconds: float = 3600, min_age_seconds: float = 300,
+                 janitor_interval_seconds: float = 600, use_memory_scratch: bool = False) -> None:
+        self.base_dir = base_dir
+        # Entries younger than this are never evicted for size.
+        self.min_age_seconds = min_age_seconds
+        self.janitor_interval_seconds = janitor_interval_seconds
+        # In-flight scratch directories are touched this often so that no janitor, in this
+        # or another worker process, evicts them: their mtime always stays well inside both
+        # the age limit and the size-eviction grace period.
+        self.heartbeat_interval_seconds = min(janitor_interval_seconds, scratch_max_age_seconds / 4,
+                                              min_age_seconds / 2)
+
+        if use_memory_scratch and os.path.isdir(MEMORY_SCRATCH_ROOT):
+            self.scratch_root = os.path.join(MEMORY_SCRATCH_ROOT, "voice_assistant_scratch")
+        else:
+            if use_memory_scratch:
+                logger.warning(f"{MEMORY_SCRATCH_ROOT} not available; using {base_dir} for scratch files")
+            self.scratch_root = base_dir
+        os.makedirs(self.base_dir, exist_ok=True)
+        os.makedirs(self.scratch_root, exist_ok=True)
+
+        self._managed_dirs: Dict[str, Dict[str, Optional[float]]] = {}
+        self.add_managed_dir(self.scratch_root, scratch_max_age_seconds, max_bytes)
+        self.add_managed_dir(self.base_dir, scratch_max_age_seconds, max_bytes)
+
+        self._active: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._janitor: Optional[threading.Thread] = None
+
+    def add_managed_dir(self, path: str, max_age_seconds: float, max_bytes: Optional[int] = None) -> None:
+        """
+        Have the janitor sweep top-level entries of `path`: entries older than
+        `max_age_seconds` are removed, then (if `max_bytes` is set) the oldest entries
+        until the directory's total is under `max_bytes`.
+        """
+        path = os.path.abspath(path)
+        policy = self._managed_dirs.get(path)
+        if policy is not None:
+            max_age_seconds = min(max_age_seconds, policy["max_age"])
+            if policy["max_bytes"] is not None:
+                max_bytes = policy["max_bytes"] if max_bytes is None else min(max_bytes, policy["max_bytes"])
+        self._managed_dirs[path] = {"max_age": max_age_seconds, "max_bytes": max_bytes}
+
+    @contextmanager
+    def scratch(self, prefix: str = "req-") -> Iterator[str]:
+        """Unique scratch directory for one request; it and everything in it is removed on exit."""
+        path = tempfile.mkdtemp(prefix=prefix, dir=self.scratch_root)
+        with self._lock:
+            self._active.add(os.path.abspath(path))
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+            with self._lock:
+                self._active.discard(os.path.abspath(path))
+
+    def heartbeat(self) -> None:
+        """Refresh the mtime of this process's in-flight scratch directories."""
+        with self._lock:
+            active = list(self._active)
+        for path in active:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def _collect(self, root: str, active: set) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) for every inactive top-level entry of a managed dir."""
+        entries = []
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    path = os.path.abspath(entry.path)
+                    if path in active or path in self._managed_dirs:
+                        continue
+                    try:
+                        mtime = entry.stat(follow_symlinks=False).st_mtime
+                    except OSError:
+                        continue
+                    entries.append((mtime, _entry_size(entry), path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def sweep(self) -> Dict[str, int]:
+        """For each managed dir, delete expired entries, then the oldest ones until its quota is met."""
+        with self._lock:
+            active = set(self._active)
+        now = time.time()
+        removed = freed = total_remaining = 0
+        for root, policy in list(self._managed_dirs.items()):
+            remaining = []
+            for mtime, size, path in self._collect(root, active):
+                if now - mtime > policy["max_age"]:
+                    _remove_entry(path)
+                    removed += 1
+                    freed += size
+                else:
+                    remaining.append((mtime, size, path))
+
+            total = sum(size for _, size, _ in remaining)
+            max_bytes = policy["max_bytes"]
+            if max_bytes is not None and total > max_bytes:
+                for mtime, size, path in sorted(remaining):
+                    if total <= max_bytes:
+                        break
+                    if now - mtime < self.min_age_seconds:
+                        continue
+                    _remove_entry(path)
+                    removed += 1
+                    freed += size
+                    total -= size
+            total_remaining += total
+
+        if removed:
+            logger.info(f"Storage janitor removed {removed} entries ({freed} bytes); {total_remaining} bytes remain")
+        return {"removed": removed, "freed_bytes": freed, "total_bytes": total_remaining}
+
+    def _run_janitor(self) -> None:
+        next_sweep = 0.0
+        while True:
+            try:
+                self.heartbeat()
+                if time.monotonic() >= next_sweep:
+                    self.sweep()
+                    next_sweep = time.monotonic() + self.janitor_interval_seconds
+            except Exception as e:
+                logger.error(f"Storage janitor sweep failed: {e}")
+            if self._stop.wait(self.heartbeat_interval_seconds):
+                return
+
+    def start_janitor(self) -> None:
+        if self._janitor is not None and self._janitor.is_alive():
+            return
+        self._stop.clear()
+        self._janitor = threading.Thread(target=self._run_janitor, name="storage-janitor", daemon=True)
+        self._janitor.start()
+        logger.info(f"Storage janitor started (interval={self.janitor_interval_seconds:g}s)")
+
+    def stop_janitor(self) -> None:
+        self._stop.set()
+        if self._janitor is not None:
+            self._janitor.join(timeout=5)
+            self._janitor = None
@@ -3,9 +3,11 @@
 import os
 import json
 import uuid
-import tempfile
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+import shutil
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import logging
@@ -15,17 +17,28 @@ import logging
 # You might need to adjust your PYTHONPATH or ensure your IDE recognizes 'app' as a package.
 # Example for running: `uvicorn backend_api:app --host 0.0.0.0 --port 5000` from project root
 from app.pipeline.core import MedicalAudioProcessor
+from app.pipeline.segments import SegmentStore
+from app.pipeline.storage import StorageManager
 from app.agent.config import set_session_id, logger, GEMINI_API_KEY
-from app.agent.core import process_medicines, process_appointment
+from app.agent.core import run_plan_actions
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the storage janitor for the lifetime of the app."""
+    storage.start_janitor()
+    yield
+    storage.stop_janitor()
+
+
 # --- FastAPI App Setup ---
 app = FastAPI(
     title="Medical Audio Processor API",
     description="API for processing medical audio, generating SOAP notes, and executing treatment plans.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for local development with React Native
@@ -38,7 +51,25 @@ app.add_middleware(
 )
 
 UPLOAD_FOLDER = 'recordings_backend'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# --- Storage: per-request scratch directories plus a background janitor ---
+# Leftover scratch/upload files are removed by age, then oldest-first until they fit in
+# STORAGE_MAX_BYTES. USE_MEMORY_SCRATCH=true puts scratch directories on tmpfs (/dev/shm) when available.
+storage = StorageManager(
+    UPLOAD_FOLDER,
+    max_bytes=int(os.getenv("STORAGE_MAX_BYTES", str(2 * 1024 ** 3))),
+    scratch_max_age_seconds=float(os.getenv("SCRATCH_MAX_AGE_SECONDS", "3600")),
+    janitor_interval_seconds=float(os.getenv("STORAGE_JANITOR_INTERVAL_SECONDS", "600")),
+    use_memory_scratch=os.getenv("USE_MEMORY_SCRATCH", "false").lower() == "true",
+)
+
+# Transcript segments (timings, probabilities, word timestamps) are kept per processed upload
+# in a compact columnar form and served via /sessions/{segments_id}/segments instead of the
+# main response. The segments_id is generated server-side (128-bit random), never client-supplied.
+segment_store = SegmentStore(max_sessions=int(os.getenv("SEGMENT_STORE_MAX_SESSIONS", "256")))
+# Word-level timestamps need an extra Whisper alignment pass on every upload; off by default.
+SEGMENT_WORD_TIMESTAMPS = os.getenv("SEGMENT_WORD_TIMESTAMPS", "false").lower() == "true"
 
 # --- Global MedicalAudioProcessor Instance ---
 # This ensures models are loaded only once when the FastAPI app starts
@@ -77,24 +108,25 @@ async def process_audio_api(
         logger.error(f"[{session_id}] No audio file provided.")
         raise HTTPException(status_code=400, detail="No audio file provided.")
 
-    # Save the uploaded file temporarily
-    # Using tempfile for better cleanup, though in this example, UPLOAD_FOLDER is still used for processor context
-    # It's good practice to save to a known location, and then use processor logic.
     try:
-        # Create a temporary file to save the uploaded audio
-        with tempfile.NamedTemporaryFile(delete=False, dir=UPLOAD_FOLDER, suffix=os.path.splitext(audio.filename)[1]) as temp_audio_file:
-            contents = await audio.read()
-            temp_audio_file.write(contents)
-            filepath = temp_audio_file.name
-        logger.info(f"[{session_id}] Audio file saved to {filepath}")
-
-        # Re-use the existing pipeline logic
-        wav_path = processor.ensure_wav(filepath)
-        transcript = processor.transcribe_file(wav_path)
+        # The upload and everything derived from it (e.g. the converted WAV) live in a
+        # per-request scratch directory that is removed as a whole once transcription is done.
+        with storage.scratch() as scratch_dir:
+            filepath = os.path.join(scratch_dir, "upload" + os.path.splitext(audio.filename)[1].lower())
+            with open(filepath, "wb") as temp_audio_file:
+                shutil.copyfileobj(audio.file, temp_audio_file, UPLOAD_CHUNK_SIZE)
+            logger.info(f"[{session_id}] Audio file saved to {filepath}")
+
+            # Re-use the existing pipeline logic
+            wav_path = processor.ensure_wav(filepath, output_dir=scratch_dir)
+            segments = processor.transcribe_segments(wav_path, word_timestamps=SEGMENT_WORD_TIMESTAMPS)
+            transcript = segments.text if segments is not None else ""
         
         if not transcript:
             logger.error(f"[{session_id}] Transcription failed for {audio.filename}.")
             raise HTTPException(status_code=500, detail="Failed to transcribe audio.")
+        segments_id = uuid.uuid4().hex
+        segment_store.put(segments_id, segments)
 
         gemini_summary_raw = processor.query_gemini(transcript)
         
@@ -107,7 +139,10 @@ async def process_audio_api(
         response_data = {
             "transcript": transcript,
             "soap_sections": soap_sections,
-            "audio_file_name": audio.filename
+            "audio_file_name": audio.filename,
+            "session_id": session_id,
+            "segments_id": segments_id,
+            "segment_count": len(segments)
         }
 
         # Optional: Include NER metrics if section_text is provided
@@ -131,11 +166,31 @@ async def process_audio_api(
     except Exception as e:
         logger.error(f"[{session_id}] Error during audio processing: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-    finally:
-        # Clean up the temporary audio file
-        if 'filepath' in locals() and os.path.exists(filepath):
-            os.remove(filepath)
-            logger.info(f"[{session_id}] Cleaned up temporary audio file: {filepath}")
+
+
+@app.get("/sessions/{segments_id}/segments")
+async def get_segments_api(
+    segments_id: str,
+    start: Optional[float] = Query(None, ge=0, description="Return segments ending after this time (seconds)."),
+    end: Optional[float] = Query(None, ge=0, description="Return segments starting before this time (seconds)."),
+    words: bool = Query(False, description="Include word-level timestamps (empty unless SEGMENT_WORD_TIMESTAMPS is enabled)."),
+    format: str = Query("json", pattern="^(json|msgpack)$")
+):
+    """
+    Returns transcript segments for a processed upload (the `segments_id` returned by
+    /process_audio), optionally restricted to a time range.
+    `format=msgpack` returns a compact columnar binary payload instead of JSON.
+    """
+    segments = segment_store.get(segments_id)
+    if segments is None:
+        raise HTTPException(status_code=404, detail="No segments found for this ID.")
+    if start is not None and end is not None and end < start:
+        raise HTTPException(status_code=400, detail="'end' must not be before 'start'.")
+
+    lo, hi = segments.index_range(start, end)
+    if format == "msgpack":
+        return Response(content=segments.to_msgpack(lo, hi, include_words=words), media_type="application/x-msgpack")
+    return JSONResponse(content=segments.to_dict(lo, hi, include_words=words), status_code=200)
 
 
 @app.post("/approve_plan")
@@ -157,25 +212,21 @@ async def approve_plan_api(payload: dict):
         logger.warning(f"[{session_id}] No valid plan section provided for approval.")
         return JSONResponse(content={"status": "warning", "message": "No valid plan section provided for approval."}, status_code=200)
 
-    results = {}
     try:
-        # Process Medicines
-        logger.info(f"[{session_id}] Processing medicines...")
-        medicine_res = process_medicines(plan_section)
-        results['medicine_processing'] = medicine_res
+        # Medicine processing and appointment handling run concurrently on one shared plan analysis
+        logger.info(f"[{session_id}] Running agent actions...")
+        results = await run_plan_actions(plan_section, user_email, send_email=send_email)
 
-        # Process Appointment - Generate content first (send_email flag controls sending)
-        logger.info(f"[{session_id}] Generating appointment email content...")
-        appointment_preview_res = process_appointment(plan_section, user_email, send_email=False)
-        results['appointment_preview'] = appointment_preview_res
+        incomplete = [name for name, res in results.items() if isinstance(res, dict) and res.get("status") == "timeout"]
+        if incomplete:
+            results['incomplete_actions'] = incomplete
+            logger.warning(f"[{session_id}] Agent actions timed out: {incomplete}")
 
-        if appointment_preview_res["status"] == "success" and "email_content" in appointment_preview_res:
+        appointment_preview_res = results.get('appointment_preview', {})
+        if appointment_preview_res.get("status") == "success" and "email_content" in appointment_preview_res:
             if send_email:
-                # If email content was generated and sending requested, now actually send it
-                logger.info(f"[{session_id}] Sending appointment email...")
-                appointment_send_res = process_appointment(plan_section, user_email, send_email=True)
-                results['appointment_sending'] = appointment_send_res
-                if appointment_send_res["status"] == "success":
+                appointment_send_res = results.get('appointment_sending', {})
+                if appointment_send_res.get("status") == "success":
                     results['message'] = "Plan approved and actions executed (including appointment email)."
                     logger.info(f"[{session_id}] Plan approved and actions executed successfully.")
                     return JSONResponse(content=results, status_code=200)
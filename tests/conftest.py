@@ -0,0 +1,21 @@
+import logging
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.agent.config builds the Gemini client at import time and requires GEMINI_API_KEY,
+# so tests replace it with a module exposing the same names.
+config = types.ModuleType("app.agent.config")
+config.logger = logging.getLogger("MedicalAgent")
+config.llm = None
+config.AGENT_ANALYSIS_PROMPT = "Plan: {plan_section}"
+config.AGENT_ANALYSIS_TIMEOUT = 5.0
+config.AGENT_ACTION_TIMEOUT = 5.0
+config.AGENT_MAX_WORKERS = 4
+config.EMAIL_ENABLED = False
+config.SENDGRID_API_KEY = None
+config.SENDGRID_TIMEOUT = 5.0
+config.GEMINI_API_KEY = "test"
+sys.modules["app.agent.config"] = config
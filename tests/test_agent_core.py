@@ -0,0 +1,138 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.agent import core
+
+ANALYSIS = "MEDICINES_FOUND: Amoxicillin 500mg; Ibuprofen 200mg\nAPPOINTMENT_FOUND: Follow-up in 2 weeks"
+
+
+class FakeLLM:
+    def __init__(self, content=ANALYSIS, delay=0.0, error=None):
+        self.content = content
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(content=self.content)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(core, "llm", FakeLLM())
+    monkeypatch.setattr(core, "save_medicine_to_excel", lambda medicines: calls.append("excel") or "saved")
+    monkeypatch.setattr(core, "send_email_schedule", lambda details, email: calls.append("email") or "sent")
+    monkeypatch.setattr(core, "ACTION_REGISTRY", dict(core.ACTION_REGISTRY))
+    return calls
+
+
+def run(**kwargs):
+    kwargs.setdefault("send_email", True)
+    return asyncio.run(core.run_plan_actions("plan", "patient@example.com", **kwargs))
+
+
+def test_runs_all_actions_on_one_analysis(calls):
+    results = run()
+    assert {name: res["status"] for name, res in results.items()} == {
+        "medicine_processing": "success",
+        "appointment_preview": "success",
+        "appointment_sending": "success",
+    }
+    assert core.llm.calls == 1
+    assert sorted(calls) == ["email", "excel"]
+
+
+def test_sending_omitted_when_not_requested(calls):
+    results = run(send_email=False)
+    assert "appointment_sending" not in results
+    assert "email" not in calls
+
+
+def test_analysis_failure_reports_only_enabled_actions(calls, monkeypatch):
+    monkeypatch.setattr(core, "llm", FakeLLM(error=RuntimeError("boom")))
+    results = run(send_email=False)
+    assert results == {
+        "medicine_processing": {"status": "error", "error": "boom"},
+        "appointment_preview": {"status": "error", "error": "boom"},
+    }
+
+
+def test_analysis_timeout(calls, monkeypatch):
+    monkeypatch.setattr(core, "llm", FakeLLM(delay=0.3))
+    monkeypatch.setattr(core, "AGENT_ANALYSIS_TIMEOUT", 0.05)
+    results = run()
+    assert {res["status"] for res in results.values()} == {"timeout"}
+
+
+def test_requested_action_pulls_in_dependencies(calls):
+    results = run(actions=["appointment_sending"])
+    assert set(results) == {"appointment_preview", "appointment_sending"}
+    assert "excel" not in calls
+
+
+def test_unknown_action_rejected(calls):
+    with pytest.raises(ValueError):
+        run(actions=["nope"])
+
+
+def test_register_requires_known_dependencies(calls):
+    with pytest.raises(ValueError):
+        core.register_action("late", depends_on=("missing",))(lambda context, deps: None)
+
+
+def test_pure_action_timeout_is_partial_result(calls):
+    @core.register_action("slow_lookup", timeout=0.05)
+    def slow_lookup(context, deps):
+        time.sleep(0.3)
+        return {"status": "success"}
+
+    results = run()
+    assert results["slow_lookup"]["status"] == "timeout"
+    assert results["medicine_processing"]["status"] == "success"
+
+
+def test_side_effect_action_runs_to_completion(calls):
+    @core.register_action("slow_write", timeout=0.05, side_effects=True)
+    def slow_write(context, deps):
+        time.sleep(0.2)
+        calls.append("slow_write")
+        return {"status": "success"}
+
+    results = run()
+    assert results["slow_write"] == {"status": "success"}
+    assert "slow_write" in calls
+
+
+def test_independent_actions_run_concurrently(calls):
+    for name in ("a", "b", "c"):
+        core.register_action(name)(lambda context, deps: time.sleep(0.2) or {"status": "success"})
+
+    started = time.perf_counter()
+    results = run(actions=["a", "b", "c"])
+    assert time.perf_counter() - started < 0.5
+    assert set(results) == {"a", "b", "c"}
+
+
+def test_dependency_result_passed_to_dependent(calls):
+    seen = {}
+
+    @core.register_action("first")
+    def first(context, deps):
+        return {"status": "success", "value": 42}
+
+    @core.register_action("second", depends_on=("first",))
+    def second(context, deps):
+        seen.update(deps)
+        return None
+
+    results = run(actions=["second"])
+    assert seen == {"first": {"status": "success", "value": 42}}
+    assert "second" not in results
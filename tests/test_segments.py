@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.pipeline.segments import SegmentStore, TranscriptSegments
+
+
+def _word(text, start, end):
+    return SimpleNamespace(word=text, start=start, end=end, probability=0.9)
+
+
+def _segments():
+    return TranscriptSegments.from_segments([
+        SimpleNamespace(text=" Hello   there ", start=0.0, end=1.5, avg_logprob=-0.2, no_speech_prob=0.01,
+                        words=[_word(" Hello", 0.0, 0.5), _word(" there", 0.6, 1.5)]),
+        SimpleNamespace(text="   ", start=1.5, end=2.0, avg_logprob=0.0, no_speech_prob=0.9, words=[]),
+        SimpleNamespace(text="How are you?", start=2.0, end=3.0, avg_logprob=-0.3, no_speech_prob=0.02,
+                        words=[_word(" How", 2.0, 2.2), _word(" are", 2.3, 2.5), _word(" you?", 2.6, 3.0)]),
+        SimpleNamespace(text="Fine.", start=3.0, end=4.0, avg_logprob=-0.1, no_speech_prob=0.0,
+                        words=[_word(" Fine.", 3.0, 4.0)]),
+    ])
+
+
+def test_text_matches_whitespace_normalized_join():
+    segments = _segments()
+    assert segments.text == "Hello there How are you? Fine."
+    assert len(segments) == 3
+    assert [segments.segment_text(i) for i in range(3)] == ["Hello there", "How are you?", "Fine."]
+
+
+def test_segment_at_offset():
+    segments = _segments()
+    assert segments.segment_at_offset(0) == 0
+    assert segments.segment_at_offset(12) == 1
+    assert segments.segment_at_offset(len(segments.text) - 1) == 2
+
+
+@pytest.mark.parametrize("start,end,expected", [
+    (None, None, (0, 3)),
+    (1.6, None, (1, 3)),
+    (None, 1.0, (0, 1)),
+    (2.5, 3.5, (1, 3)),
+    (1.5, 2.0, (1, 1)),
+    (10.0, None, (3, 3)),
+])
+def test_index_range(start, end, expected):
+    assert _segments().index_range(start, end) == expected
+
+
+def test_msgpack_slice_is_rebased():
+    segments = _segments()
+    restored = TranscriptSegments.from_msgpack(segments.to_msgpack(1, 3, include_words=True))
+
+    assert restored.text == "How are you? Fine."
+    view = restored.to_dict(include_words=True)
+    assert [row["text"] for row in view["segments"]] == ["How are you?", "Fine."]
+    assert [row["char_offset"] for row in view["segments"]] == [0, 13]
+    assert [w["word"] for w in view["segments"][0]["words"]] == ["How", "are", "you?"]
+    assert view["segments"][1]["words"] == [{"start": 3.0, "end": 4.0, "probability": 0.9, "word": "Fine."}]
+    assert view["segments"][0]["start"] == 2.0
+
+
+def test_msgpack_round_trip_without_words():
+    segments = _segments()
+    restored = TranscriptSegments.from_msgpack(segments.to_msgpack())
+    assert restored.text == segments.text
+    assert restored.to_dict() == segments.to_dict()
+    assert restored.words(0) == []
+
+
+def test_msgpack_empty_range():
+    restored = TranscriptSegments.from_msgpack(_segments().to_msgpack(2, 2))
+    assert len(restored) == 0
+    assert restored.text == ""
+
+
+def test_segment_store_evicts_least_recently_used():
+    store = SegmentStore(max_sessions=2)
+    store.put("a", _segments())
+    store.put("b", _segments())
+    assert store.get("a") is not None
+    store.put("c", _segments())
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.get("c") is not None
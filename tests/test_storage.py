@@ -0,0 +1,114 @@
+import os
+import time
+
+import pytest
+
+from app.pipeline.storage import StorageManager
+
+
+def _write(path, size, age=0.0):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return StorageManager(str(tmp_path / "uploads"), max_bytes=1000, scratch_max_age_seconds=100,
+                          min_age_seconds=10)
+
+
+def test_scratch_dir_removed_on_exit(storage):
+    with storage.scratch() as scratch_dir:
+        _write(os.path.join(scratch_dir, "upload.mp3"), 10)
+        _write(os.path.join(scratch_dir, "upload.wav"), 10)
+    assert not os.path.exists(scratch_dir)
+
+
+def test_scratch_dir_removed_on_error(storage):
+    with pytest.raises(RuntimeError):
+        with storage.scratch() as scratch_dir:
+            raise RuntimeError("boom")
+    assert not os.path.exists(scratch_dir)
+
+
+def test_sweep_removes_expired_entries(storage):
+    old = _write(os.path.join(storage.base_dir, "old.wav"), 10, age=200)
+    new = _write(os.path.join(storage.base_dir, "new.wav"), 10, age=50)
+    result = storage.sweep()
+    assert result["removed"] == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
+
+
+def test_sweep_enforces_size_quota_oldest_first(storage):
+    paths = [_write(os.path.join(storage.base_dir, f"f{i}.wav"), 400, age=60 - i) for i in range(4)]
+    storage.sweep()
+    assert [os.path.exists(p) for p in paths] == [False, False, True, True]
+
+
+def test_size_quota_spares_recent_entries(storage):
+    paths = [_write(os.path.join(storage.base_dir, f"f{i}.wav"), 400, age=5) for i in range(4)]
+    storage.sweep()
+    assert all(os.path.exists(p) for p in paths)
+
+
+def test_active_scratch_dir_never_swept(storage):
+    with storage.scratch() as scratch_dir:
+        _write(os.path.join(scratch_dir, "upload.wav"), 5000)
+        os.utime(scratch_dir, (time.time() - 500,) * 2)
+        storage.sweep()
+        assert os.path.exists(scratch_dir)
+
+
+def test_heartbeat_keeps_in_flight_dirs_fresh_for_other_processes(storage, tmp_path):
+    other = StorageManager(storage.base_dir, max_bytes=1000, scratch_max_age_seconds=100)
+    with storage.scratch() as scratch_dir:
+        os.utime(scratch_dir, (time.time() - 500,) * 2)
+        storage.heartbeat()
+        other.sweep()
+        assert os.path.exists(scratch_dir)
+
+
+def test_default_heartbeat_outpaces_other_workers_size_eviction(tmp_path):
+    base_dir = str(tmp_path / "uploads")
+    worker = StorageManager(base_dir, max_bytes=1000)
+    other = StorageManager(base_dir, max_bytes=1000)
+    assert worker.heartbeat_interval_seconds <= worker.min_age_seconds / 2
+
+    with worker.scratch() as scratch_dir:
+        _write(os.path.join(scratch_dir, "upload.wav"), 5000)
+        # Worst case between two heartbeats with the default intervals
+        stale = time.time() - worker.heartbeat_interval_seconds
+        os.utime(scratch_dir, (stale, stale))
+        assert other.sweep()["removed"] == 0
+        assert os.path.exists(scratch_dir)
+
+
+def test_managed_dir_has_its_own_quota(storage, tmp_path):
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    storage.add_managed_dir(str(reports), max_age_seconds=1000)
+    report = _write(str(reports / "report.xlsx"), 5000, age=500)
+    upload = _write(os.path.join(storage.base_dir, "upload.wav"), 400, age=50)
+
+    storage.sweep()
+    assert os.path.exists(report)
+    assert os.path.exists(upload)
+
+    expired = _write(str(reports / "expired.xlsx"), 10, age=2000)
+    storage.sweep()
+    assert not os.path.exists(expired)
+
+
+def test_managed_dir_size_quota(storage, tmp_path):
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    storage.add_managed_dir(str(reports), max_age_seconds=1000, max_bytes=500)
+    older = _write(str(reports / "a.xlsx"), 400, age=60)
+    newer = _write(str(reports / "b.xlsx"), 400, age=30)
+    storage.sweep()
+    assert not os.path.exists(older)
+    assert os.path.exists(newer)